@@ -1,15 +1,35 @@
+import gc
 import os
+import re
 import string
-import gzip
+import heapq
+import mmap
 import pickle
+import struct
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from typing import List, Tuple, Dict
+from typing import List, Dict
 
-CACHE_FILE = "autocomplete_cache.pkl.gz"  # Compressed cache filename
-_PUNCT_TABLE = str.maketrans('', '', string.punctuation)  # Translation table to remove punctuation
+import numpy as np
+from numba import njit
+
+CACHE_FILE = "autocomplete_cache.pkl"  # Cache filename (uncompressed pickle)
+_MMAP_MAGIC = b"ACMMAP03"  # Leading bytes of caches whose arrays are memory-mapped on load
+_BUFFER_ALIGN = 64  # Alignment of the raw array buffers in the cache file
+_PUNCT_RE = re.compile("[" + re.escape(string.punctuation) + "]+")  # Runs of punctuation to remove
 
 _SUB_PENALTIES = [5, 4, 3, 2, 1]  # Penalties for substitutions
 _INSDEL_PENALTIES = [10, 8, 6, 4, 2]  # Penalties for insertions or deletions
+_NO_MATCH = -(2 ** 31)  # Kernel result for "no single-edit match"; real scores can be negative
+_MAX_RESULTS = 5  # Number of completions returned per query
+_MAX_KEY_LEN = 3  # Length of the word chunks stored in the prefix trie
+
+# Penalty of an edit by kind (row) and 1-based position (column, the last one covering
+# every later position); the zero row is for "exact" and unknown kinds
+_PENALTY_TABLE = np.array([_SUB_PENALTIES, _INSDEL_PENALTIES, _INSDEL_PENALTIES,
+                           [0] * len(_SUB_PENALTIES)], dtype=np.int8)
+_KIND_ID = {"substitution": 0, "insertion": 1, "deletion": 2, "exact": -1}
 
 
 @dataclass
@@ -26,19 +46,14 @@ def normalize_text(s: str) -> str:
     Normalize input text by removing punctuation, converting to lowercase,
     and collapsing multiple spaces into a single space.
     """
-    return " ".join(s.translate(_PUNCT_TABLE).lower().split())
+    return " ".join(_PUNCT_RE.sub("", s).lower().split())
 
 
 def penalty_for(kind: str, pos: int) -> int:
     """
     Return penalty score based on edit type and position.
     """
-    idx = pos - 1
-    if kind == "substitution":
-        return _SUB_PENALTIES[idx] if idx < len(_SUB_PENALTIES) else _SUB_PENALTIES[-1]
-    if kind in ("insertion", "deletion"):
-        return _INSDEL_PENALTIES[idx] if idx < len(_INSDEL_PENALTIES) else _INSDEL_PENALTIES[-1]
-    return 0
+    return int(_PENALTY_TABLE[_KIND_ID.get(kind, -1), min(pos - 1, _PENALTY_TABLE.shape[1] - 1)])
 
 
 def single_edit_match_info(prefix: str, candidate: str):
@@ -82,152 +97,804 @@ def single_edit_match_info(prefix: str, candidate: str):
     return None
 
 
+@njit(cache=True)
+def _decode_utf8(sent, t):
+    """
+    Return the code point of the UTF-8 character starting at byte sent[t] and the index of the next one.
+    """
+    b = np.int64(sent[t])
+    if b < 0x80:
+        return b, t + 1
+    if b < 0xE0:
+        return ((b & 0x1F) << 6) | (sent[t + 1] & 0x3F), t + 2
+    if b < 0xF0:
+        return ((b & 0x0F) << 12) | ((sent[t + 1] & 0x3F) << 6) | (sent[t + 2] & 0x3F), t + 3
+    return (((b & 0x07) << 18) | ((sent[t + 1] & 0x3F) << 12) | ((sent[t + 2] & 0x3F) << 6)
+            | (sent[t + 3] & 0x3F)), t + 4
+
+
+@njit(cache=True)
+def _best_edit1_rows(prefix, sent, start, end, penalties):
+    """
+    Row-by-row version of 'best_edit1_score' for prefixes too long for one 64-bit mask.
+
+    exact[j] tells whether prefix[:j] ends at the current character, and edit[j] holds
+    the lowest penalty of a one-edit alignment of prefix[:j] ending there.
+    """
+    lp = prefix.shape[0]
+    cap = penalties.shape[1] - 1
+    none = 1 << 30
+    exact = np.zeros(lp + 1, dtype=np.bool_)
+    edit = np.full(lp + 1, none, dtype=np.int64)
+    exact[0] = True
+    if lp > 1:
+        # Dropping prefix[0] needs no sentence character
+        edit[1] = penalties[2, 0]
+    best = none
+
+    t = start
+    while t < end:
+        c, t = _decode_utf8(sent, t)
+        # Walk j downwards so exact[j - 1] / edit[j - 1] still hold the previous character's values
+        for j in range(lp, 0, -1):
+            same = prefix[j - 1] == c
+            e = none
+            if same:
+                e = edit[j - 1]
+            elif exact[j - 1]:
+                e = penalties[0, min(j - 1, cap)]
+            if exact[j]:
+                # The character is an extra one after prefix[:j]
+                e = min(e, penalties[1, min(j, cap)])
+            if j > 1 and exact[j - 2] and prefix[j - 2] == c:
+                # prefix[:j - 1] ends here and prefix[j - 1] is dropped
+                e = min(e, penalties[2, min(j - 1, cap)])
+            edit[j] = e
+            exact[j] = exact[j - 1] and same
+        edit[0] = penalties[1, 0]
+        if lp > 1:
+            edit[1] = min(edit[1], penalties[2, 0])
+        best = min(best, edit[lp])
+
+    if best == none:
+        return _NO_MATCH
+    return 2 * lp - best
+
+
+@njit(cache=True)
+def best_edit1_score(prefix, sent, start, end, penalties):
+    """
+    Return the best single-edit score of 'prefix' against sent[start:end], or _NO_MATCH.
+
+    'prefix' holds code points (uint32) and 'sent' is UTF-8 (uint8), so lengths and
+    edit positions count characters, like the exact score 2 * len(prefix) does.
+    'penalties' is _PENALTY_TABLE. Scores every window one edit away from the prefix,
+    exactly like running 'single_edit_match_info' + 'penalty_for' over all of them, in
+    one pass over the sentence. Exact containment is checked by the caller.
+
+    This is bit-parallel shift-and matching with one edit allowed: bit j of a state
+    mask is set when prefix[:j + 1] is aligned to the characters ending at the current
+    one. As the penalty depends on where the edit happened, one-edit states are kept
+    per edit kind and table column k.
+    """
+    lp = prefix.shape[0]
+    if lp > 64:
+        return _best_edit1_rows(prefix, sent, start, end, penalties)
+
+    slots = penalties.shape[1]
+    one = np.uint64(1)
+    masks = np.zeros(256, dtype=np.uint64)  # Bits of the prefix positions holding each Latin-1 character
+    wide = np.zeros(lp, dtype=np.int64)  # Other code points of the prefix ...
+    wide_masks = np.zeros(lp, dtype=np.uint64)  # ... and their bits
+    n_wide = 0
+    at_pos = np.zeros(slots, dtype=np.uint64)  # Bit j when an edit at position j falls in column k
+    after_pos = np.zeros(slots, dtype=np.uint64)  # Bit j when an insertion after prefix[:j + 1] falls in column k
+    for j in range(lp):
+        bit = one << np.uint64(j)
+        cp = prefix[j]
+        if cp < 256:
+            masks[cp] |= bit
+        else:
+            k = 0
+            while k < n_wide and wide[k] != cp:
+                k += 1
+            if k == n_wide:
+                wide[k] = cp
+                n_wide += 1
+            wide_masks[k] |= bit
+        at_pos[min(j, slots - 1)] |= bit
+        after_pos[min(j + 1, slots - 1)] |= bit
+    full = one << np.uint64(lp - 1)
+
+    exact = np.uint64(0)
+    subs = np.zeros(slots, dtype=np.uint64)
+    ins = np.zeros(slots, dtype=np.uint64)
+    dels = np.zeros(slots, dtype=np.uint64)
+    best = 1 << 30
+
+    t = start
+    while t < end:
+        first = t == start
+        c, t = _decode_utf8(sent, t)
+        if c < 256:
+            m = masks[c]
+        else:
+            m = np.uint64(0)
+            for k in range(n_wide):
+                if wide[k] == c:
+                    m = wide_masks[k]
+                    break
+
+        opened = (exact << one) | one  # Alignments that may take this character next
+        new_exact = opened & m
+        reached = np.uint64(0)
+        for k in range(slots):
+            subs[k] = ((subs[k] << one) & m) | (opened & ~m & at_pos[k])
+            # The character is an extra one after an exact alignment
+            ins[k] = ((ins[k] << one) & m) | (exact & after_pos[k])
+            # prefix[j] is dropped right after an exact alignment ending here
+            dels[k] = ((dels[k] << one) & m) | ((new_exact << one) & at_pos[k])
+            reached |= subs[k] | ins[k] | dels[k]
+        if not first:
+            # The previous character is an extra one in front of prefix[0]
+            ins[0] |= one & m
+        if lp > 1:
+            # prefix[0] is dropped and the window starts with prefix[1]
+            dels[0] |= (one << one) & m
+        exact = new_exact
+
+        # Only look up penalties once some alignment covers the whole prefix
+        if not (reached | ins[0] | dels[0]) & full:
+            continue
+        for k in range(slots):
+            if subs[k] & full and penalties[0, k] < best:
+                best = penalties[0, k]
+            if ins[k] & full and penalties[1, k] < best:
+                best = penalties[1, k]
+            if dels[k] & full and penalties[2, k] < best:
+                best = penalties[2, k]
+
+    if best == 1 << 30:
+        return _NO_MATCH
+    return 2 * lp - best
+
+
+def _iter_txt(root: str):
+    """
+    Yield the paths of all .txt files under 'root', in the same top-down order as os.walk.
+
+    os.scandir returns entries with cached type information, saving a stat call per entry.
+    """
+    stack = [root]
+    while stack:
+        dirpath = stack.pop()
+        subdirs = []
+        try:
+            with os.scandir(dirpath) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.name.lower().endswith('.txt'):
+                        yield entry.path
+        except OSError as e:
+            # Like os.walk, skip folders that cannot be listed
+            print(f"Warning: skipped {dirpath}: {e}")
+        stack.extend(reversed(subdirs))
+
+
+def _index_file(path: str):
+    """
+    Read and index one file; runs in a worker process while building.
+
+    Returns (texts, line_numbers, norm_blob, norm_lengths, keys, pair_keys, pair_idxs),
+    with sentence indices local to the file and pair_keys indexing into 'keys',
+    or the error message if the file could not be read.
+    """
+    try:
+        # Read the whole file at once; text mode already turned \r\n and \r into \n
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = f.read().split("\n")
+    except Exception as e:
+        return str(e)
+
+    stripped = [line.strip() for line in lines]
+    line_numbers = array("i", [i for i, text in enumerate(stripped) if text])
+    texts = [text for text in stripped if text]
+    norms = [normalize_text(text) for text in texts]
+
+    # Each sentence's keys, collected as a set of ids and appended in one go: short
+    # words (length 2 or 1) as is, longer ones as all their substrings of length 3.
+    # Words repeat a lot, so their key ids are looked up only once per file
+    key_ids: Dict[str, int] = {}
+    word_keys: Dict[str, List[int]] = {}
+    pair_keys = array("i")
+    counts = array("i")
+    for norm in norms:
+        keys = set()
+        for w in norm.split():
+            ids = word_keys.get(w)
+            if ids is None:
+                ids = word_keys[w] = [key_ids.setdefault(w[j:j + _MAX_KEY_LEN], len(key_ids))
+                                      for j in range(max(len(w) - _MAX_KEY_LEN + 1, 1))]
+            keys.update(ids)
+        pair_keys.extend(keys)
+        counts.append(len(keys))
+
+    pair_idxs = np.repeat(np.arange(len(texts), dtype=np.int32), np.frombuffer(counts, dtype=np.int32))
+
+    encoded = [norm.encode("utf-8") for norm in norms]
+    norm_lengths = array("i", map(len, encoded))
+    return texts, line_numbers, b"".join(encoded), norm_lengths, list(key_ids), pair_keys, pair_idxs
+
+
+def _pickle_mapped(path: str, state: tuple):
+    """
+    Write 'state' to 'path' in the format read by '_unpickle_mapped'.
+
+    A pickle header holds the Python objects; every numpy array follows it as a raw,
+    aligned buffer (pickle protocol 5 out-of-band data), so loading can map them
+    instead of reading them.
+    """
+    buffers = []
+    header = pickle.dumps(state, protocol=5, buffer_callback=buffers.append)
+    views = [buf.raw() for buf in buffers]
+    with open(path, "wb") as f:
+        f.write(_MMAP_MAGIC)
+        f.write(struct.pack(f"<QQ{len(views)}Q", len(header), len(views), *(v.nbytes for v in views)))
+        f.write(header)
+        for view in views:
+            f.write(b"\0" * (-f.tell() % _BUFFER_ALIGN))
+            f.write(view)
+
+
+def _unpickle_mapped(mapped) -> tuple:
+    """
+    Unpickle a cache written by 'AutoCompleteSystem.save_cache' from its memory map.
+
+    The arrays come back as read-only views of 'mapped' instead of copies.
+    """
+    pos = len(_MMAP_MAGIC)
+    header_len, count = struct.unpack_from("<QQ", mapped, pos)
+    sizes = struct.unpack_from(f"<{count}Q", mapped, pos + 16)
+    pos += 16 + 8 * count
+    view = memoryview(mapped)
+    header = view[pos:pos + header_len]
+    pos += header_len
+
+    buffers = []
+    for size in sizes:
+        pos += -pos % _BUFFER_ALIGN
+        buffers.append(view[pos:pos + size])
+        pos += size
+    return pickle.loads(header, buffers=buffers)
+
+
+@njit(cache=True)
+def _bucket_postings(keys, idxs, offsets):
+    """
+    Counting sort of the (key, index) pairs into one array laid out by 'offsets'.
+
+    'offsets' comes in zeroed and is filled in here; counting in place avoids the
+    int64 copy of 'keys' that np.bincount would make. It must be int64: the pair
+    count passes 2**31 at a few GB of text, and a wrapped (negative) offset would
+    silently index from the end. Pairs arrive in sentence order, so every bucket
+    comes out sorted.
+    """
+    for i in range(keys.shape[0]):
+        offsets[keys[i] + 1] += 1
+    for k in range(1, offsets.shape[0]):
+        offsets[k] += offsets[k - 1]
+
+    fill = offsets[:-1].copy()
+    out = np.empty_like(idxs)
+    for i in range(keys.shape[0]):
+        k = keys[i]
+        out[fill[k]] = idxs[i]
+        fill[k] += 1
+    return out
+
+
+class TrieNode:
+    """
+    Node of a compact (PATRICIA) trie.
+
+    'label' is the edge leading into this node, so unary chains collapse into
+    one node. 'key_id' is -1 unless an indexed key ends here.
+    """
+    __slots__ = ("label", "children", "key_id")
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.children: Dict[str, "TrieNode"] = {}
+        self.key_id = -1
+
+
+class PrefixTrie:
+    """
+    Compact prefix trie mapping each key to the sorted, de-duplicated indices of its sentences.
+
+    While building, every (key id, sentence index) pair is appended to two flat
+    int32 buffers. Freezing buckets the pairs by key into one contiguous
+    'postings_flat' array, so a key's postings are the slice
+    postings_flat[postings_offsets[k]:postings_offsets[k + 1]]. The build-only
+    state is dropped on freezing, so a frozen trie (and the cache) holds just the
+    tree and the two postings arrays.
+    """
+
+    def __init__(self):
+        self.root = TrieNode()
+        self._last_idx: List[int] = []  # Build only: last sentence recorded for each key id
+        self._key_ids: Dict[str, int] = {}  # Build only: ids of keys seen since thawing, to skip the walk
+        self._pair_keys = array("i")
+        self._pair_idxs = array("i")
+        self.postings_flat = np.zeros(0, dtype=np.int32)
+        self.postings_offsets = np.zeros(1, dtype=np.int64)
+        self._frozen = False
+
+    def __len__(self) -> int:
+        if not self._frozen:
+            self.freeze()
+        return len(self.postings_offsets) - 1
+
+    def __contains__(self, key: str) -> bool:
+        return self.lookup(key) is not None
+
+    def __getstate__(self):
+        self.freeze()
+        return self.__dict__
+
+    def freeze(self):
+        """
+        Bucket the buffered pairs by key into 'postings_flat' / 'postings_offsets'.
+        """
+        if self._frozen:
+            return
+        keys = np.frombuffer(self._pair_keys, dtype=np.int32)
+        idxs = np.frombuffer(self._pair_idxs, dtype=np.int32)
+        self.postings_offsets = np.zeros(len(self._last_idx) + 1, dtype=np.int64)
+        self.postings_flat = _bucket_postings(keys, idxs, self.postings_offsets)
+        self._pair_keys = array("i")
+        self._pair_idxs = array("i")
+        self._last_idx = []
+        self._key_ids = {}
+        self._frozen = True
+
+    def _thaw(self):
+        """
+        Turn the frozen postings back into pair buffers so new keys can be inserted.
+        """
+        counts = np.diff(self.postings_offsets)
+        self._pair_keys = array("i", np.repeat(np.arange(len(counts), dtype=np.int32), counts).tobytes())
+        self._pair_idxs = array("i", self.postings_flat.tobytes())
+        # Each bucket is sorted, so its last entry is the key's last sentence
+        last_idx = np.full(len(counts), -1, dtype=np.int64)
+        last_idx[counts > 0] = self.postings_flat[self.postings_offsets[1:][counts > 0] - 1]
+        self._last_idx = last_idx.tolist()
+        self._frozen = False
+
+    def _key_id(self, key: str) -> int:
+        """
+        Return the id of 'key', adding it to the trie first if needed.
+        """
+        key_id = self._key_ids.get(key)
+        if key_id is not None:
+            return key_id
+
+        node = self.root
+        i = 0
+        while i < len(key):
+            child = node.children.get(key[i])
+            if child is None:
+                child = node.children[key[i]] = TrieNode(key[i:])
+                node = child
+                break
+
+            label = child.label
+            j = 1
+            while j < len(label) and i + j < len(key) and label[j] == key[i + j]:
+                j += 1
+
+            if j < len(label):
+                # Split the edge; the lower part keeps its key and children
+                upper = TrieNode(label[:j])
+                child.label = label[j:]
+                upper.children[child.label[0]] = child
+                node.children[key[i]] = upper
+                child = upper
+
+            node = child
+            i += j
+
+        if node.key_id < 0:
+            node.key_id = len(self._last_idx)
+            self._last_idx.append(-1)
+        self._key_ids[key] = node.key_id
+        return node.key_id
+
+    def insert(self, key: str, idx: int):
+        """
+        Insert 'key' and record 'idx' for it.
+        """
+        if self._frozen:
+            self._thaw()
+
+        key_id = self._key_id(key)
+        # Indices arrive in increasing order, so checking the last one is enough to dedupe
+        if self._last_idx[key_id] != idx:
+            self._last_idx[key_id] = idx
+            self._pair_keys.append(key_id)
+            self._pair_idxs.append(idx)
+
+    def add_postings(self, keys: List[str], pair_keys, pair_idxs, base: int):
+        """
+        Merge pairs indexed elsewhere, e.g. by '_index_file'.
+
+        'pair_keys' index into 'keys' and 'pair_idxs' are shifted by 'base'. The
+        sentences must come after everything recorded so far.
+        """
+        if self._frozen:
+            self._thaw()
+
+        key_ids = np.fromiter(map(self._key_id, keys), dtype=np.int32, count=len(keys))
+        local_keys = np.frombuffer(pair_keys, dtype=np.int32)
+        idxs = np.frombuffer(pair_idxs, dtype=np.int32) + np.int32(base)
+        self._pair_keys.frombytes(key_ids[local_keys].tobytes())
+        self._pair_idxs.frombytes(idxs.tobytes())
+
+        # Keep 'insert' deduplicating against the pairs merged here
+        last = np.full(len(keys), -1, dtype=np.int32)
+        np.maximum.at(last, local_keys, idxs)
+        last_idx = self._last_idx
+        for key_id, idx in zip(key_ids.tolist(), last.tolist()):
+            if idx >= 0:
+                last_idx[key_id] = idx
+
+    def alphabet(self) -> List[str]:
+        """
+        Return every character that starts an indexed key.
+        """
+        return list(self.root.children)
+
+    def lookup_containing(self, pieces) -> List[np.ndarray]:
+        """
+        Return the postings of every key that contains one of 'pieces' (shorter than the keys).
+
+        Walks the whole trie, so it is only meant for the fallback's short pieces.
+        """
+        if not self._frozen:
+            self.freeze()
+
+        lengths = {len(piece) for piece in pieces}
+        found = []
+        stack = [(self.root, "")]
+        while stack:
+            node, key = stack.pop()
+            if node.key_id >= 0 and any(key[i:i + n] in pieces for n in lengths for i in range(len(key) - n + 1)):
+                found.append(self.postings_flat[self.postings_offsets[node.key_id]:self.postings_offsets[node.key_id + 1]])
+            stack.extend((child, key + child.label) for child in node.children.values())
+        return found
+
+    def lookup(self, key: str):
+        """
+        Return the postings of 'key' as an np.int32 array view, or None if the key is not indexed.
+        """
+        if not self._frozen:
+            self.freeze()
+
+        node = self.root
+        i = 0
+        while i < len(key):
+            child = node.children.get(key[i])
+            if child is None or not key.startswith(child.label, i):
+                return None
+            node = child
+            i += len(child.label)
+
+        if node.key_id < 0:
+            return None
+        return self.postings_flat[self.postings_offsets[node.key_id]:self.postings_offsets[node.key_id + 1]]
+
+
 class AutoCompleteSystem:
     def __init__(self):
         """
         Initialize the autocomplete system with empty sentence and index storage.
         """
-        self.sentences: List[Tuple[str, str, int]] = []
-        self.word_index: Dict[str, List[int]] = {}
+        self.sentences_text: List[str] = []  # Original text of each sentence
+        self.paths: List[str] = []  # Unique source file paths
+        self.path_idx = np.zeros(0, dtype=np.int32)  # Index into 'paths' for each sentence
+        self.offsets = np.zeros(0, dtype=np.int32)  # Line number of each sentence in its source file
+        self._path_table: Dict[str, int] = {}  # Interns source paths while building
+        self.trie = PrefixTrie()
+        self.sent_buf = b""  # Normalized sentences, UTF-8 encoded and concatenated (or the cache map holding them)
+        self._sent_base = 0  # Position of the first sentence in sent_buf
+        self.sent_bytes = np.frombuffer(self.sent_buf, dtype=np.uint8)  # Zero-copy uint8 view of the sentences
+        self.sent_off = np.zeros(1, dtype=np.int64)  # Start offset of each sentence in sent_bytes (may pass 4 GiB)
+        self._cache_map = None  # Memory map of the loaded cache file, backing the arrays above
+        self._forget_last_query()
 
     def build_from_folder(self, root_folder: str):
         """
         Build the index from all supported text files under 'root_folder'.
+
+        Files are indexed in parallel by worker processes and merged in path order,
+        so sentence indices do not depend on which worker finishes first.
         """
         print("Scanning files and loading sentences...")
-
-        for dirpath, _, filenames in os.walk(root_folder):
-            for fname in filenames:
-                if not fname.lower().endswith('.txt'):
+        path_idx = array("i")
+        offsets = array("i")
+        blobs: List[bytes] = []
+        lengths = array("i")
+
+        paths = list(_iter_txt(root_folder))
+        workers = min(len(paths), os.cpu_count() or 1)
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            parts = pool.map(_index_file, paths, chunksize=4) if pool else map(_index_file, paths)
+            for fullpath, part in zip(paths, parts):
+                if isinstance(part, str):
+                    print(f"Warning: skipped {fullpath}: {part}")
                     continue
 
-                fullpath = os.path.join(dirpath, fname)
-                try:
-                    with open(fullpath, 'r', encoding='utf-8') as f:
-                        for i, line in enumerate(f):
-                            line_stripped = line.strip()
-                            if not line_stripped:
-                                continue
-
-                            idx = len(self.sentences)
-                            self.sentences.append((line_stripped, fullpath, i))
-
-                            norm = normalize_text(line_stripped)
-                            words = norm.split()
-
-                            for w in words:
-                                if len(w) in (1,2):
-                                    # Store short words (length 2 or 1) as is
-                                    self.word_index.setdefault(w, []).append(idx)
-                                else:
-                                    # Index only substrings of length 3
-                                    length = 3
-                                    if len(w) >= length:
-                                        for j in range(len(w) - length + 1):
-                                            substring = w[j:j + length]
-                                            self.word_index.setdefault(substring, []).append(idx)
-
-                except Exception as e:
-                    print(f"Warning: skipped {fullpath}: {e}")
-
-        print(f"Loaded {len(self.sentences)} sentences, indexed {len(self.word_index)} prefixes.")
+                texts, line_numbers, norm_blob, norm_lengths, keys, pair_keys, pair_idxs = part
+                path_id = self._path_table.get(fullpath)
+                if path_id is None:
+                    path_id = self._path_table[fullpath] = len(self.paths)
+                    self.paths.append(fullpath)
+
+                self.trie.add_postings(keys, pair_keys, pair_idxs, len(self.sentences_text))
+                self.sentences_text.extend(texts)
+                path_idx.extend(array("i", [path_id]) * len(texts))
+                offsets.extend(line_numbers)
+                blobs.append(norm_blob)
+                lengths.extend(norm_lengths)
+        finally:
+            if pool:
+                pool.shutdown()
+
+        self.path_idx = np.concatenate([self.path_idx, np.frombuffer(path_idx, dtype=np.int32)])
+        self.offsets = np.concatenate([self.offsets, np.frombuffer(offsets, dtype=np.int32)])
+        self.trie.freeze()
+        self._extend_sentence_buffer(b"".join(blobs), np.frombuffer(lengths, dtype=np.int32))
+        self._forget_last_query()
+        print(f"Loaded {len(self.sentences_text)} sentences, indexed {len(self.trie)} prefixes.")
+
+    def _extend_sentence_buffer(self, blob: bytes, lengths):
+        """
+        Append the concatenated normalized sentences 'blob' to the shared byte buffer
+        and extend the offsets by their byte 'lengths'.
+        """
+        self._release_cache_map()
+        self.sent_off = np.concatenate([self.sent_off, self.sent_off[-1] + np.cumsum(lengths, dtype=np.int64)])
+        self.sent_buf += blob
+        self.sent_bytes = np.frombuffer(self.sent_buf, dtype=np.uint8)
 
     def save_cache(self):
         """
-        Save sentences and index to a compressed cache file.
+        Save sentences and index to the cache file (see '_pickle_mapped').
         """
         print(f"Saving cache to {CACHE_FILE}...")
-        with gzip.open(CACHE_FILE, "wb") as f:
-            pickle.dump((self.sentences, self.word_index), f)
+        # Write a new file and swap it in, so the old one is never seen half-written
+        tmp_file = CACHE_FILE + ".tmp"
+        _pickle_mapped(tmp_file, (self.sentences_text, self.paths, self.path_idx, self.offsets,
+                                  self.trie, self.sent_bytes, self.sent_off))
+        self._release_cache_map()
+        os.replace(tmp_file, CACHE_FILE)
         print("Cache saved.")
 
+    def _release_cache_map(self):
+        """
+        Copy the arrays backed by the loaded cache file into memory and close its map.
+
+        Windows cannot replace or delete a file while it is mapped.
+        """
+        if self._cache_map is None:
+            return
+        self.path_idx = np.array(self.path_idx)
+        self.offsets = np.array(self.offsets)
+        self.sent_off = np.array(self.sent_off)
+        self.sent_buf = self.sent_bytes.tobytes()
+        self._sent_base = 0
+        self.sent_bytes = np.frombuffer(self.sent_buf, dtype=np.uint8)
+        self.trie.postings_flat = np.array(self.trie.postings_flat)
+        self.trie.postings_offsets = np.array(self.trie.postings_offsets)
+        try:
+            self._cache_map.close()
+        except BufferError:
+            # Views handed out earlier (e.g. by PrefixTrie.lookup) still point into the map;
+            # it is closed when the last of them goes away
+            pass
+        self._cache_map = None
+
     def load_cache(self):
         """
-        Load sentences and index from a compressed cache file.
+        Load sentences and index from the cache file.
+
+        The arrays are memory-mapped rather than read, so the OS only pages in the
+        postings and sentences a query touches. Raises ValueError for caches written in another
+        format (e.g. by an older version); those have to be rebuilt.
         """
         print(f"Loading cache from {CACHE_FILE}...")
-        with gzip.open(CACHE_FILE, "rb") as f:
-            self.sentences, self.word_index = pickle.load(f)
-        print(f"Loaded {len(self.sentences)} sentences, indexed {len(self.word_index)} prefixes.")
+        with open(CACHE_FILE, "rb") as raw:
+            if raw.read(len(_MMAP_MAGIC)) != _MMAP_MAGIC:
+                raise ValueError(f"{CACHE_FILE} was not written by this version and has to be rebuilt")
+
+        # Unpickling creates millions of objects; garbage-collector passes over them only
+        # slow it down (about 2.5x on a full corpus), and none of them form cycles
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with open(CACHE_FILE, "rb") as raw:
+                mapped = mmap.mmap(raw.fileno(), 0, access=mmap.ACCESS_READ)
+            state = _unpickle_mapped(mapped)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+        (self.sentences_text, self.paths, self.path_idx, self.offsets,
+         self.trie, self.sent_bytes, self.sent_off) = state
+        self._cache_map = mapped
+        # Containment is searched with mmap.find, which takes positions in the whole file
+        whole = np.frombuffer(mapped, dtype=np.uint8)
+        self._sent_base = self.sent_bytes.ctypes.data - whole.ctypes.data
+        del whole
+        self.sent_buf = mapped
+        self._forget_last_query()
+        self._path_table = {path: i for i, path in enumerate(self.paths)}
+        print(f"Loaded {len(self.sentences_text)} sentences, indexed {len(self.trie)} prefixes.")
+
+    def _one_edit_candidates(self, prefix: str) -> np.ndarray:
+        """
+        Return every sentence that may hold 'prefix' with at most one edit, for when the
+        first chunk of its first word is not indexed.
+
+        One edit leaves all but one of the prefix's disjoint _MAX_KEY_LEN-character chunks
+        intact, and an intact chunk is always indexed. An unindexed first chunk must hold
+        the edit, so any later chunk bounds the candidates; a first word shorter than a
+        chunk may instead sit unedited inside a longer word. Only without such anchors are
+        the first word's one-edit neighbours tried, walking the trie for those shorter
+        than a chunk.
+        """
+        words = prefix.split()
+        word = words[0]
+        chunks = [w[j:j + _MAX_KEY_LEN] for w in words for j in range(0, len(w) - _MAX_KEY_LEN + 1, _MAX_KEY_LEN)]
+        keys, pieces = set(), set()
+
+        if len(word) >= _MAX_KEY_LEN and len(chunks) > 1:
+            keys.add(chunks[1])
+        elif len(word) < _MAX_KEY_LEN and len(chunks) > 1:
+            keys.update(chunks[:2])
+        elif len(word) < _MAX_KEY_LEN and chunks:
+            # Either the chunk is intact, or the edit is in it and the word is intact
+            keys.add(chunks[0])
+            pieces.add(word)
+        else:
+            if len(word) < _MAX_KEY_LEN:
+                pieces.add(word)
+            # Only edits inside the first _MAX_KEY_LEN characters change the chunk; an edit
+            # adding a space splits it, and any one of its pieces must occur in the sentence
+            alphabet = self.trie.alphabet() + [" "]
+            neighbours = set()
+            for i in range(min(len(word) + 1, _MAX_KEY_LEN)):
+                head, tail = word[:i], word[i:]
+                if tail:
+                    neighbours.add((head + tail[1:])[:_MAX_KEY_LEN])
+                for c in alphabet:
+                    neighbours.add((head + c + tail)[:_MAX_KEY_LEN])
+                    if tail:
+                        neighbours.add((head + c + tail[1:])[:_MAX_KEY_LEN])
+            for neighbour in neighbours:
+                piece = max(neighbour.split(), key=len, default="")
+                if len(piece) == _MAX_KEY_LEN:
+                    keys.add(piece)
+                elif piece:
+                    pieces.add(piece)
+
+        postings = [p for p in map(self.trie.lookup, keys) if p is not None]
+        if pieces:
+            postings.extend(self.trie.lookup_containing(pieces))
+        if not postings:
+            return np.zeros(0, dtype=np.int32)
+        return np.unique(np.concatenate(postings)).astype(np.int32)
+
+    def _forget_last_query(self):
+        """
+        Drop the candidates remembered from the previous query (the index changed).
+        """
+        self._last_query = ""  # Normalized previous query
+        self._last_key = ""  # Start of its first word, which decides the candidate lookup
+        self._last_cands = np.zeros(0, dtype=np.int32)  # Sentences that matched it
 
+    def _make_result(self, idx: int, score: int) -> AutoCompleteData:
+        """
+        Build the result object for sentence 'idx'.
+        """
+        return AutoCompleteData(self.sentences_text[idx], self.paths[self.path_idx[idx]],
+                                int(self.offsets[idx]), score)
 
     def get_best_k_completions(self, prefix: str) -> List[AutoCompleteData]:
         """
-        Return the top 5 best completions for the given prefix.
+        Return the top _MAX_RESULTS best completions for the given prefix.
         """
         prefix_norm = normalize_text(prefix)
         if not prefix_norm:
             return []
 
-        results = []
+        scored = []  # (score, sentence index) pairs
         lp = len(prefix_norm)
+        # input() can hand over lone surrogates (surrogateescape); passed through, they
+        # simply never occur in the strictly encoded sentences
+        prefix_raw = prefix_norm.encode("utf-8", "surrogatepass")
+        prefix_chars = np.frombuffer(prefix_norm.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
 
         first_word = prefix_norm.split()[0]
-        candidate_idxs = set()
-
-        # Handle very short words (length 1 or 2) with direct dictionary lookup
-        if len(first_word) in (1, 2):
-            indices = self.word_index.get(first_word, [])
-            if indices:
-                candidate_idxs.update(indices)
-            else:
-                # No direct matches for short word — fallback to scanning all sentences
-                print(f"No direct matches found for '{first_word}', checking all sentences for single edit matches...")
-                candidate_idxs = set(range(len(self.sentences)))
+        lookup_key = first_word[:_MAX_KEY_LEN + 1]
 
+        if self._last_query and prefix_norm.startswith(self._last_query) and lookup_key == self._last_key:
+            # Typing extended the previous query: the candidate lookup is the same, and any
+            # sentence matching the longer prefix (exactly or with one edit) matched the shorter one
+            candidate_idxs = self._last_cands
         else:
-            if len(first_word) >= 3:
-                substring = first_word[:3]
-                indices = self.word_index.get(substring, [])
-                candidate_idxs.update(indices)
-
-            # If still no direct matches — fallback to scanning all sentences
-            if not candidate_idxs:
-                print(f"No direct matches found for '{first_word}', checking all sentences for single edit matches...")
-                candidate_idxs = set(range(len(self.sentences)))
-
-        candidate_idxs = list(candidate_idxs)
-
-        for idx in candidate_idxs:
-            sentence, src, offset = self.sentences[idx]
-            sentence_norm = normalize_text(sentence)
-
-            if prefix_norm in sentence_norm:
-                score = 2 * lp
-                results.append(AutoCompleteData(sentence, src, offset, score))
-                continue
-
-            found = False
-            for L in {lp, lp + 1, lp - 1}:
-                if L <= 0 or L > len(sentence_norm):
-                    continue
-
-                for start in range(len(sentence_norm) - L + 1):
-                    sub = sentence_norm[start:start + L]
-                    info = single_edit_match_info(prefix_norm, sub)
-
-                    if info and info[0] != "exact":
-                        kind, pos = info
-                        base_score = 2 * lp
-                        score = base_score - penalty_for(kind, pos)
-                        results.append(AutoCompleteData(sentence, src, offset, score))
-                        found = True
-                        break
-
-                if found:
-                    break
-
-        results.sort(key=lambda x: (-x.score, x.completed_sentence.lower()))
-
-        seen = set()
-        final_results = []
-        for r in results:
-            key = r.completed_sentence
-            if key not in seen:
-                final_results.append(r)
-                seen.add(key)
-            if len(final_results) >= 5:
+            # Sentences containing the first indexed chunk of the first word (sorted, unique)
+            candidate_idxs = self.trie.lookup(first_word[:_MAX_KEY_LEN])
+
+            # If no direct matches — fallback to every sentence that may hold a one-edit variant
+            if candidate_idxs is None:
+                print(f"No direct matches found for '{first_word}', checking single edit variants...")
+                candidate_idxs = self._one_edit_candidates(prefix_norm)
+
+            candidate_idxs = np.asarray(candidate_idxs, dtype=np.int32)
+
+        sentences_text = self.sentences_text
+        find = self.sent_buf.find
+        base = self._sent_base
+
+        # Exact containment uses CPython's C substring search, bounded to each sentence's
+        # slice of the shared buffer; tolist() hands the loop plain ints
+        starts = self.sent_off[candidate_idxs].tolist()
+        ends = self.sent_off[candidate_idxs + 1].tolist()
+        exact_idxs, fuzzy = [], []
+        for idx, start, end in zip(candidate_idxs.tolist(), starts, ends):
+            if find(prefix_raw, base + start, base + end) >= 0:
+                exact_idxs.append(idx)
+            else:
+                fuzzy.append((idx, start, end))
+
+        scored.extend((2 * lp, idx) for idx in exact_idxs)
+
+        # A single-edit match always scores below an exact one, so once there are
+        # enough distinct exact sentences the fuzzy scan cannot change the answer
+        distinct = set()
+        scan_fuzzy = True
+        for idx in exact_idxs:
+            distinct.add(sentences_text[idx])
+            if len(distinct) >= _MAX_RESULTS:
+                scan_fuzzy = False
                 break
 
-        return final_results
-
+        if scan_fuzzy:
+            fuzzy_hits = []
+            sent_bytes = self.sent_bytes
+            for idx, start, end in fuzzy:
+                score = best_edit1_score(prefix_chars, sent_bytes, start, end, _PENALTY_TABLE)
+                if score != _NO_MATCH:
+                    scored.append((score, idx))
+                    fuzzy_hits.append(idx)
+        else:
+            # Unscanned sentences may still be single-edit matches of a longer query
+            fuzzy_hits = [idx for idx, _, _ in fuzzy]
+
+        self._last_query, self._last_key = prefix_norm, lookup_key
+        self._last_cands = np.union1d(np.asarray(exact_idxs, dtype=np.int32), np.asarray(fuzzy_hits, dtype=np.int32))
+
+        # Keep the best hit per distinct sentence: highest score, then earliest in the corpus
+        best: Dict[str, tuple] = {}
+        for score, idx in scored:
+            text = sentences_text[idx]
+            rank = (-score, idx)
+            if text not in best or rank < best[text]:
+                best[text] = rank
+
+        # Partial sort: order by score, then alphabetically, then corpus order
+        top = heapq.nsmallest(_MAX_RESULTS, best.items(), key=lambda item: (item[1][0], item[0].lower(), item[1][1]))
+        return [self._make_result(idx, -neg_score) for _, (neg_score, idx) in top]
@@ -3,6 +3,7 @@ import tempfile
 import os
 import shutil
 from unittest.mock import patch
+import numpy as np
 from autocomplete import AutoCompleteSystem
 from initialize import initialize_autocomplete_system
 
@@ -12,7 +13,7 @@ class TestCacheIntegrity(unittest.TestCase):
 
     def setUp(self):
         self.test_dir = tempfile.mkdtemp()
-        self.cache_file = os.path.join(self.test_dir, "test_cache.pkl.gz")
+        self.cache_file = os.path.join(self.test_dir, "test_cache.pkl")
 
         # Patch cache location
         import autocomplete
@@ -34,7 +35,7 @@ class TestCacheIntegrity(unittest.TestCase):
             f.write("Another test line\n")
 
         self.acs.build_from_folder(self.test_dir)
-        original_count = len(self.acs.sentences)
+        original_count = len(self.acs.sentences_text)
 
         # Save and reload
         self.acs.save_cache()
@@ -42,21 +43,59 @@ class TestCacheIntegrity(unittest.TestCase):
         new_acs.load_cache()
 
         # Verify data integrity
-        self.assertEqual(len(new_acs.sentences), original_count)
-        self.assertEqual(len(new_acs.word_index), len(self.acs.word_index))
+        self.assertEqual(len(new_acs.sentences_text), original_count)
+        self.assertEqual(len(new_acs.trie), len(self.acs.trie))
+        self.assertEqual(new_acs.sent_bytes.tobytes(), self.acs.sent_buf)
+        self.assertEqual(new_acs.sent_off.tolist(), self.acs.sent_off.tolist())
+        self.assertEqual(new_acs.sent_off.dtype, np.int64)
 
         # Verify functionality works the same
         original_results = self.acs.get_best_k_completions("test")
         new_results = new_acs.get_best_k_completions("test")
         self.assertEqual(len(original_results), len(new_results))
 
+    def test_load_outdated_cache(self):
+        """Test caches in another format are rejected with a clear error"""
+        import pickle
+
+        with open(self.cache_file, "wb") as f:
+            pickle.dump(([("Test sentence here", "test.txt", 0)], {"test": [0]}), f)
+
+        with self.assertRaises(ValueError):
+            AutoCompleteSystem().load_cache()
+
+    def test_load_maps_arrays(self):
+        """Test loading maps the index arrays and re-saving releases the map"""
+        with open(os.path.join(self.test_dir, "test.txt"), 'w') as f:
+            f.write("Test sentence here\n")
+            f.write("Another test line\n")
+
+        self.acs.build_from_folder(self.test_dir)
+        self.acs.save_cache()
+        new_acs = AutoCompleteSystem()
+        new_acs.load_cache()
+        self.assertFalse(new_acs.trie.postings_flat.flags.writeable)
+        self.assertEqual(new_acs.trie.postings_flat.tolist(), self.acs.trie.postings_flat.tolist())
+        self.assertEqual(new_acs.path_idx.tolist(), self.acs.path_idx.tolist())
+        self.assertFalse(new_acs.sent_bytes.flags.writeable)
+        results = new_acs.get_best_k_completions("test line")
+        self.assertEqual([r.completed_sentence for r in results], ["Another test line"])
+
+        # Re-saving closes the map first (Windows cannot replace a mapped file);
+        # the loaded index keeps working from in-memory copies
+        new_acs.save_cache()
+        self.assertIsNone(new_acs._cache_map)
+        self.assertEqual(new_acs.sent_buf, self.acs.sent_buf)
+        results = new_acs.get_best_k_completions("another")
+        self.assertEqual([r.completed_sentence for r in results], ["Another test line"])
+
 
 class TestInitializationFlow(unittest.TestCase):
     """Test initialization logic"""
 
     def setUp(self):
         self.test_dir = tempfile.mkdtemp()
-        self.cache_file = os.path.join(self.test_dir, "test_cache.pkl.gz")
+        self.cache_file = os.path.join(self.test_dir, "test_cache.pkl")
 
         # Patch both autocomplete and initialize modules
         import autocomplete
@@ -83,15 +122,37 @@ class TestInitializationFlow(unittest.TestCase):
             initialize_autocomplete_system(acs)
 
         # Should build system and create cache
-        self.assertGreater(len(acs.sentences), 0)
+        self.assertGreater(len(acs.sentences_text), 0)
         self.assertTrue(os.path.exists(self.cache_file))
 
+    def test_init_rebuilds_outdated_cache(self):
+        """Test initialization rebuilds a cache written by an older version"""
+        import gzip
+        import pickle
+
+        with open(os.path.join(self.test_dir, "test.txt"), 'w') as f:
+            f.write("Test content here\n")
+        with gzip.open(self.cache_file, "wb") as f:
+            pickle.dump(([("Old content", "old.txt", 0)], {"old": [0]}), f)
+
+        acs = AutoCompleteSystem()
+        with patch('sys.argv', ['main.py', self.test_dir]):
+            initialize_autocomplete_system(acs)
+
+        self.assertEqual(acs.sentences_text, ["Test content here"])
+        reloaded = AutoCompleteSystem()
+        reloaded.load_cache()
+        self.assertEqual(reloaded.sentences_text, ["Test content here"])
+
     def test_init_with_existing_cache(self):
         """Test initialization uses existing cache"""
         # Create cache first
         acs1 = AutoCompleteSystem()
-        acs1.sentences = [("Test", "file.txt", 0)]
-        acs1.word_index = {"test": [0]}
+        acs1.sentences_text = ["Test"]
+        acs1.paths = ["file.txt"]
+        acs1.path_idx = np.zeros(1, dtype=np.int32)
+        acs1.offsets = np.zeros(1, dtype=np.int32)
+        acs1.trie.insert("test", 0)
         acs1.save_cache()
 
         # Initialize new system
@@ -99,8 +160,8 @@ class TestInitializationFlow(unittest.TestCase):
         initialize_autocomplete_system(acs2)
 
         # Should load from cache
-        self.assertEqual(len(acs2.sentences), 1)
-        self.assertEqual(acs2.sentences[0][0], "Test")
+        self.assertEqual(len(acs2.sentences_text), 1)
+        self.assertEqual(acs2.sentences_text[0], "Test")
 
 
 class TestEndToEndWorkflow(unittest.TestCase):
@@ -108,7 +169,7 @@ class TestEndToEndWorkflow(unittest.TestCase):
 
     def setUp(self):
         self.test_dir = tempfile.mkdtemp()
-        self.cache_file = os.path.join(self.test_dir, "test_cache.pkl.gz")
+        self.cache_file = os.path.join(self.test_dir, "test_cache.pkl")
 
         # Patch both modules
         import autocomplete
@@ -159,7 +220,7 @@ class TestEndToEndWorkflow(unittest.TestCase):
         acs.build_from_folder(self.test_dir)
 
         # Should not find CSV content
-        csv_found = any("CSV" in sentence for sentence, _, _ in acs.sentences)
+        csv_found = any("CSV" in sentence for sentence in acs.sentences_text)
         self.assertFalse(csv_found, "CSV files should be ignored")
 
     def test_subfolder_scanning(self):
@@ -173,9 +234,65 @@ class TestEndToEndWorkflow(unittest.TestCase):
         acs.build_from_folder(self.test_dir)
 
         # Should find nested content
-        nested_found = any("Nested file" in sentence for sentence, _, _ in acs.sentences)
+        nested_found = any("Nested file" in sentence for sentence in acs.sentences_text)
         self.assertTrue(nested_found, "Should find files in subfolders")
 
+    def test_unreadable_subfolder_is_skipped(self):
+        """Test a folder that cannot be listed is skipped instead of aborting the build"""
+        locked = os.path.join(self.test_dir, "locked")
+        os.makedirs(locked)
+        with open(os.path.join(locked, "hidden.txt"), 'w') as f:
+            f.write("Hidden file content\n")
+
+        real_scandir = os.scandir
+
+        def scandir(path):
+            if path == locked:
+                raise PermissionError(13, "Permission denied", path)
+            return real_scandir(path)
+
+        acs = AutoCompleteSystem()
+        with patch("autocomplete.os.scandir", side_effect=scandir):
+            acs.build_from_folder(self.test_dir)
+
+        self.assertFalse(any("Hidden file" in sentence for sentence in acs.sentences_text))
+        self.assertTrue(any("Hello world" in sentence for sentence in acs.sentences_text))
+
+    def test_parallel_build_matches_single_process(self):
+        """Test building with worker processes gives the same index as building in-process"""
+        os.makedirs(os.path.join(self.test_dir, "subfolder"))
+        for i in range(6):
+            with open(os.path.join(self.test_dir, "subfolder", f"part{i}.txt"), 'w') as f:
+                f.write(f"Sentence number {i} about python\n\n")
+                f.write(f"Another line {i} is here, with naïve words\n")
+
+        import autocomplete
+        single = AutoCompleteSystem()
+        with patch("autocomplete.os.cpu_count", return_value=1):
+            single.build_from_folder(self.test_dir)
+
+        parallel = AutoCompleteSystem()
+        with patch("autocomplete.os.cpu_count", return_value=4), \
+                patch("autocomplete.ProcessPoolExecutor", wraps=autocomplete.ProcessPoolExecutor) as pool:
+            parallel.build_from_folder(self.test_dir)
+        pool.assert_called_once_with(max_workers=4)
+
+        self.assertEqual(parallel.sentences_text, single.sentences_text)
+        self.assertEqual(parallel.paths, single.paths)
+        np.testing.assert_array_equal(parallel.path_idx, single.path_idx)
+        np.testing.assert_array_equal(parallel.offsets, single.offsets)
+        np.testing.assert_array_equal(parallel.sent_off, single.sent_off)
+        self.assertEqual(parallel.sent_buf, single.sent_buf)
+
+        # Key ids may be assigned in another order, so compare the postings key by key
+        keys = {w[j:j + 3] for s in single.sentences_text
+                for w in autocomplete.normalize_text(s).split() for j in range(max(len(w) - 2, 1))}
+        for key in keys:
+            np.testing.assert_array_equal(parallel.trie.lookup(key), single.trie.lookup(key))
+
+        for prefix in ("python", "line 3", "naive", "sentance"):
+            self.assertEqual(parallel.get_best_k_completions(prefix), single.get_best_k_completions(prefix))
+
 
 if __name__ == '__main__':
     unittest.main(verbosity=2)
\ No newline at end of file
@@ -3,7 +3,9 @@ import tempfile
 import os
 import shutil
 import time
-from autocomplete import AutoCompleteSystem, normalize_text, single_edit_match_info
+import numpy as np
+from autocomplete import (AutoCompleteSystem, PrefixTrie, normalize_text, penalty_for, best_edit1_score,
+                          single_edit_match_info, _PENALTY_TABLE, _NO_MATCH)
 
 
 class TestCriticalLogic(unittest.TestCase):
@@ -24,11 +26,137 @@ class TestCriticalLogic(unittest.TestCase):
         # Substitutions at different positions
         self.assertEqual(single_edit_match_info("abc", "xbc"), ("substitution", 1))
         self.assertEqual(single_edit_match_info("abc", "abx"), ("substitution", 3))
+        self.assertEqual(single_edit_match_info("abcdefghijk", "abcdefghiXk"), ("substitution", 10))
+        self.assertEqual(single_edit_match_info("café", "cafe"), ("substitution", 4))
+        self.assertIsNone(single_edit_match_info("abcdefghijk", "Xbcdefghijx"))
 
         # Should fail - too many changes
         self.assertIsNone(single_edit_match_info("abc", "xyz"))
         self.assertIsNone(single_edit_match_info("a", "abcde"))
 
+    def test_penalty_table(self):
+        """Test penalties by edit kind, including positions past the end of the table"""
+        self.assertEqual(penalty_for("substitution", 1), 5)
+        self.assertEqual(penalty_for("insertion", 2), 8)
+        self.assertEqual(penalty_for("deletion", 5), 2)
+        self.assertEqual(penalty_for("substitution", 40), 1)
+        self.assertEqual(penalty_for("deletion", 40), 2)
+        self.assertEqual(penalty_for("exact", 0), 0)
+
+    def test_compiled_scoring_matches_reference(self):
+        """Test the compiled kernel scores like single_edit_match_info + penalty_for"""
+        def score(prefix, sentence):
+            p = np.frombuffer(prefix.encode("utf-32-le"), dtype=np.uint32)
+            s = np.frombuffer(sentence.encode(), dtype=np.uint8)
+            return best_edit1_score(p, s, 0, len(s), _PENALTY_TABLE)
+
+        self.assertEqual(score("abc", "xbc"), 6 - penalty_for("substitution", 1))
+        self.assertEqual(score("abcd", "abxcd"), 8 - penalty_for("insertion", 3))
+        self.assertEqual(score("abcd", "abd"), 8 - penalty_for("deletion", 3))
+        self.assertEqual(score("abcd", "bcd"), 8 - penalty_for("deletion", 1))
+        self.assertEqual(score("ab", "xb"), 4 - penalty_for("substitution", 1))
+        self.assertEqual(score("abc", "xyz"), _NO_MATCH)
+
+        # Lengths and positions count characters, not UTF-8 bytes
+        self.assertEqual(score("café", "cafe"), 8 - penalty_for("substitution", 4))
+        self.assertEqual(score("naïve", "naïvx"), 10 - penalty_for("substitution", 5))
+
+    def test_compiled_scoring_matches_window_scan(self):
+        """Test the one-pass kernel against scoring every window, for short and long prefixes"""
+        def reference(prefix, sentence):
+            best = None
+            lp = len(prefix)
+            for start in range(len(sentence)):
+                for length in (lp - 1, lp, lp + 1):
+                    if length <= 0 or start + length > len(sentence):
+                        continue
+                    info = single_edit_match_info(prefix, sentence[start:start + length])
+                    if info and info[0] != "exact":
+                        penalty = penalty_for(*info)
+                        best = penalty if best is None else min(best, penalty)
+            return _NO_MATCH if best is None else 2 * lp - best
+
+        rng = np.random.default_rng(7)
+        for lp in (1, 2, 5, 64, 70):
+            for _ in range(200):
+                prefix = "".join(rng.choice(list("abé€ "), lp))
+                sentence = "".join(rng.choice(list("abé€ "), int(rng.integers(0, lp + 8))))
+                p = np.frombuffer(prefix.encode("utf-32-le"), dtype=np.uint32)
+                s = np.frombuffer(sentence.encode(), dtype=np.uint8)
+                self.assertEqual(best_edit1_score(p, s, 0, len(s), _PENALTY_TABLE),
+                                 reference(prefix, sentence), (prefix, sentence))
+
+
+class TestPrefixTrie(unittest.TestCase):
+    """Test the compact trie used as the sentence index"""
+
+    def test_edge_split_keeps_postings(self):
+        """Test splitting a compressed edge preserves both branches"""
+        trie = PrefixTrie()
+        trie.insert("abc", 0)
+        trie.insert("abd", 1)
+        trie.insert("ab", 2)
+
+        self.assertEqual(trie.lookup("ab").tolist(), [2])
+        self.assertEqual(trie.lookup("abc").tolist(), [0])
+        self.assertEqual(trie.lookup("abd").tolist(), [1])
+        self.assertIn("ab", trie)
+        self.assertNotIn("a", trie)
+        self.assertNotIn("abx", trie)
+
+    def test_len_counts_keys(self):
+        """Test the trie's length is its number of keys, not of nodes"""
+        trie = PrefixTrie()
+        trie.insert("abc", 0)
+        trie.insert("abd", 1)
+
+        # The split adds an inner "ab" node that is not a key
+        self.assertEqual(len(trie), 2)
+        trie.insert("ab", 2)
+        self.assertEqual(len(trie), 3)
+
+    def test_postings_are_deduplicated(self):
+        """Test each sentence index is stored once per key"""
+        trie = PrefixTrie()
+        trie.insert("xyz", 0)
+        trie.insert("xyz", 0)
+        trie.insert("xyz", 1)
+
+        self.assertEqual(trie.lookup("xyz").tolist(), [0, 1])
+        self.assertIsNone(trie.lookup("xy"))
+        self.assertIsNone(trie.lookup("xyzz"))
+
+    def test_merged_postings_are_deduplicated(self):
+        """Test inserts after add_postings and after a freeze skip sentences already recorded"""
+        trie = PrefixTrie()
+        trie.add_postings(["abc"], np.array([0], dtype=np.int32), np.array([0], dtype=np.int32), 0)
+        trie.insert("abc", 0)
+        self.assertEqual(trie.lookup("abc").tolist(), [0])
+
+        trie.insert("abc", 0)
+        trie.insert("abc", 1)
+        self.assertEqual(trie.lookup("abc").tolist(), [0, 1])
+        self.assertEqual(trie._key_ids, {})
+        self.assertEqual(trie._last_idx, [])
+
+    def test_freeze_to_numpy(self):
+        """Test frozen postings are int32 slices and inserts still work afterwards"""
+        trie = PrefixTrie()
+        trie.insert("abc", 0)
+        trie.insert("xyz", 0)
+        trie.insert("abc", 1)
+        trie.freeze()
+
+        postings = trie.lookup("abc")
+        self.assertEqual(postings.dtype, np.int32)
+        self.assertEqual(postings.tolist(), [0, 1])
+        self.assertEqual(trie.postings_offsets.tolist(), [0, 2, 3])
+        self.assertEqual(trie.postings_offsets.dtype, np.int64)
+
+        trie.insert("abc", 2)
+        self.assertEqual(trie.lookup("abc").tolist(), [0, 1, 2])
+        self.assertEqual(trie.lookup("xyz").tolist(), [0])
+
 
 class TestScoringAccuracy(unittest.TestCase):
     """Test scoring matches project spec exactly"""
@@ -77,9 +205,9 @@ class TestIndexingSystem(unittest.TestCase):
         self.acs.build_from_folder(self.test_dir)
 
         # 2-char words should be indexed completely
-        self.assertIn("to", self.acs.word_index)
-        self.assertIn("be", self.acs.word_index)
-        self.assertIn("or", self.acs.word_index)
+        self.assertIn("to", self.acs.trie)
+        self.assertIn("be", self.acs.trie)
+        self.assertIn("or", self.acs.trie)
 
     def test_fallback_mechanism(self):
         """Test fallback when no direct matches"""
@@ -93,6 +221,60 @@ class TestIndexingSystem(unittest.TestCase):
         found = any("unique" in r.completed_sentence for r in results)
         self.assertTrue(found, "Fallback should find single-edit matches")
 
+    def test_non_ascii_scoring(self):
+        """Test a typo never outranks an exact match on non-ASCII text"""
+        with open(os.path.join(self.test_dir, "test.txt"), 'w', encoding='utf-8') as f:
+            f.write("naïvx approach here\n")
+            f.write("naïve approach here\n")
+            f.write("the cafe is open\n")
+
+        self.acs.build_from_folder(self.test_dir)
+
+        results = self.acs.get_best_k_completions("naïve")
+        self.assertEqual([(r.completed_sentence, r.score) for r in results],
+                         [("naïve approach here", 10), ("naïvx approach here", 9)])
+
+        results = self.acs.get_best_k_completions("café")
+        self.assertEqual([(r.completed_sentence, r.score) for r in results], [("the cafe is open", 6)])
+
+    def test_lone_surrogate_query(self):
+        """Test a query with a lone surrogate (from surrogateescape input) is scored, not rejected"""
+        with open(os.path.join(self.test_dir, "test.txt"), 'w') as f:
+            f.write("unique sentence here\n")
+
+        self.acs.build_from_folder(self.test_dir)
+
+        # The surrogate can only match as a substitution, here for the space after "unique"
+        results = self.acs.get_best_k_completions("unique\udcff")
+        self.assertEqual([(r.completed_sentence, r.score) for r in results], [("unique sentence here", 13)])
+
+    def test_fallback_is_bounded(self):
+        """Test fallback only considers sentences holding an intact chunk of the query"""
+        with open(os.path.join(self.test_dir, "test.txt"), 'w') as f:
+            f.write("unique sentence here\n")
+            f.write("totally different words\n")
+
+        self.acs.build_from_folder(self.test_dir)
+
+        candidates = self.acs._one_edit_candidates("znique")
+        self.assertEqual(candidates.tolist(), [0])
+
+    def test_fallback_finds_short_words_inside_longer_ones(self):
+        """Test fallback finds a short first word that only occurs (edited or not) inside a longer word"""
+        with open(os.path.join(self.test_dir, "test.txt"), 'w') as f:
+            f.write("2. Link Architecture\n")
+            f.write("totally different words\n")
+
+        self.acs.build_from_folder(self.test_dir)
+
+        # Dropping the "e" leaves the "k" ending "link"
+        results = self.acs.get_best_k_completions("ke archit")
+        self.assertEqual([(r.completed_sentence, r.score) for r in results], [("2. Link Architecture", 10)])
+        results = self.acs.get_best_k_completions("nk archit")
+        self.assertEqual([(r.completed_sentence, r.score) for r in results], [("2. Link Architecture", 18)])
+        # With no intact chunk to anchor on, the neighbours shorter than a chunk are looked up
+        self.assertEqual(self.acs._one_edit_candidates("kx").tolist(), [0])
+
 
 class TestComplexQueries(unittest.TestCase):
     """Test scenarios that could break the system"""
@@ -121,6 +303,16 @@ class TestComplexQueries(unittest.TestCase):
         results = self.acs.get_best_k_completions("zxqwerty")
         self.assertLessEqual(len(results), 5)
 
+    def test_incremental_typing_matches_fresh_search(self):
+        """Test reusing the previous query's candidates gives the same answers"""
+        fresh = AutoCompleteSystem()
+        fresh.build_from_folder(self.test_dir)
+
+        for query in ["m", "ma", "mac", "mach", "machine", "machine l", "machine lx", "machine lxa"]:
+            expected = fresh.get_best_k_completions(query)
+            fresh._forget_last_query()
+            self.assertEqual(self.acs.get_best_k_completions(query), expected, query)
+
     def test_results_limit(self):
         """Test max 5 results and proper sorting"""
         results = self.acs.get_best_k_completions("a")